@@ -0,0 +1,193 @@
+import pandas as pd
+
+
+class Feature(object):
+    """
+    A named engineered feature.
+
+    Args:
+        name: Output column name
+        compute: Function (df) -> Series, run after its inputs and dependencies are available in df
+        inputs: Raw B3 columns the feature reads
+        depends: Other features the feature reads
+        window: Rows of its inputs/dependencies the feature looks at, including the current row
+        output: False for intermediate features that are only kept when explicitly requested
+    """
+
+    def __init__(self, name, compute, inputs=(), depends=(), window=1, output=True):
+        self.name = name
+        self.compute = compute
+        self.inputs = list(inputs)
+        self.depends = list(depends)
+        self.window = window
+        self.output = output
+
+
+FEATURES = {}
+
+
+def register(name, inputs=(), depends=(), window=1, output=True):
+    def decorator(compute):
+        FEATURES[name] = Feature(name, compute, inputs, depends, window, output)
+        return compute
+
+    return decorator
+
+
+def _by_ticker(df: pd.DataFrame, col: str):
+    return df.groupby('ticker', group_keys=False)[col]
+
+
+@register('daily_return', inputs=['open', 'close'])
+def _daily_return(df):
+    return (df['close'] - df['open']) / df['open']
+
+
+@register('rolling_volatility_5', depends=['daily_return'], window=5)
+def _rolling_volatility_5(df):
+    return _by_ticker(df, 'daily_return').transform(lambda x: x.rolling(5).std())
+
+
+@register('moving_avg_10', inputs=['close'], window=10)
+def _moving_avg_10(df):
+    return _by_ticker(df, 'close').transform(lambda x: x.rolling(10).mean())
+
+
+# EMAs never produce NaN, their window is the span needed for the average to settle
+@register('ema_12', inputs=['close'], window=12, output=False)
+def _ema_12(df):
+    return _by_ticker(df, 'close').transform(lambda x: x.ewm(span=12, adjust=False).mean())
+
+
+@register('ema_26', inputs=['close'], window=26, output=False)
+def _ema_26(df):
+    return _by_ticker(df, 'close').transform(lambda x: x.ewm(span=26, adjust=False).mean())
+
+
+@register('macd', depends=['ema_12', 'ema_26'])
+def _macd(df):
+    return df['ema_12'] - df['ema_26']
+
+
+@register('rsi_14', inputs=['close'], window=15)
+def _rsi_14(df):
+    def rsi(series, window=14):
+        delta = series.diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+    return _by_ticker(df, 'close').transform(rsi)
+
+
+@register('volume_change', inputs=['volume'], window=2)
+def _volume_change(df):
+    return _by_ticker(df, 'volume').pct_change()
+
+
+@register('avg_volume_10', inputs=['volume'], window=10)
+def _avg_volume_10(df):
+    return _by_ticker(df, 'volume').transform(lambda x: x.rolling(10).mean())
+
+
+@register('best_buy_sell_spread', inputs=['best_buy', 'best_sell'])
+def _best_buy_sell_spread(df):
+    return df['best_sell'] - df['best_buy']
+
+
+@register('close_to_best_buy', inputs=['close', 'best_buy'])
+def _close_to_best_buy(df):
+    return (df['close'] - df['best_buy']) / df['best_buy']
+
+
+@register('market_type_NM', inputs=['market'])
+def _market_type_nm(df):
+    # Handle null/empty market values by filling with dummy value
+    return df['market'].fillna('000').astype(str).str.contains('NM').astype(int)
+
+
+@register('asset_type_ON', inputs=['type'])
+def _asset_type_on(df):
+    return df['type'].astype(str).str.contains('ON').astype(int)
+
+
+@register('day_of_week', inputs=['date'])
+def _day_of_week(df):
+    return df['date'].dt.dayofweek
+
+
+@register('price_momentum_5', inputs=['close'], window=6)
+def _price_momentum_5(df):
+    return _by_ticker(df, 'close').transform(lambda x: (x - x.shift(5)) / x.shift(5))
+
+
+@register('high_breakout_20', inputs=['high'], window=20)
+def _high_breakout_20(df):
+    return _by_ticker(df, 'high').transform(lambda x: (x == x.rolling(20).max()).astype(int))
+
+
+@register('bollinger_upper', inputs=['close'], window=20)
+def _bollinger_upper(df):
+    # 20-day MA + 2*std
+    return _by_ticker(df, 'close').transform(lambda x: x.rolling(20).mean() + 2 * x.rolling(20).std())
+
+
+@register('stochastic_14', inputs=['close'], window=14)
+def _stochastic_14(df):
+    def stochastic_14(series):
+        low14 = series.rolling(14).min()
+        high14 = series.rolling(14).max()
+        return 100 * (series - low14) / (high14 - low14)
+
+    return _by_ticker(df, 'close').transform(stochastic_14)
+
+
+def default_features() -> list:
+    """
+    Names of the features produced when no selection is given, in output column order.
+    """
+    return [name for name, feature in FEATURES.items() if feature.output]
+
+
+def resolve(names: list = None) -> list:
+    """
+    Features needed to compute the given names (default: all output features), dependencies first.
+    """
+    names = default_features() if names is None else list(names)
+    if not names:
+        raise ValueError("At least one feature must be selected")
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(unknown)}")
+
+    ordered = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dependency in FEATURES[name].depends:
+            visit(dependency)
+        ordered.append(FEATURES[name])
+
+    for name in names:
+        visit(name)
+    return ordered
+
+
+def lookback(name: str) -> int:
+    """
+    Rows of raw history (including the current row) a feature needs to be fully defined.
+    """
+    feature = FEATURES[name]
+    dependency_lookback = max((lookback(dependency) for dependency in feature.depends), default=1)
+    return feature.window + dependency_lookback - 1
+
+
+def required_history_rows(names: list = None) -> int:
+    """
+    Rows of history per ticker (including the target row) needed for every selected feature.
+    """
+    return max(lookback(feature.name) for feature in resolve(names))
@@ -24,13 +24,14 @@ class B3HistFileParser(object):
             (147, 152),  # trades
             (152, 170),  # volume
             (170, 188),  # turnover
-            (230, 242)  # ISIN
+            (230, 242),  # ISIN
+            (210, 217)  # FATCOT (quotation factor: 1 = price per unit, 1000 = price per thousand)
         ]
 
         names = [
             "date", "bdi_code", "ticker", "company", "type", "market", "currency",
             "open", "high", "low", "avg", "close", "best_buy", "best_sell",
-            "trades", "volume", "turnover", "isin"
+            "trades", "volume", "turnover", "isin", "fatcot"
         ]
 
         df = pd.read_fwf(self._file_path, colspecs=colspecs, names=names, dtype=str)
@@ -46,5 +47,6 @@ class B3HistFileParser(object):
 
         df["trades"] = pd.to_numeric(df["trades"], errors="coerce")
         df["volume"] = pd.to_numeric(df["volume"], errors="coerce")
+        df["fatcot"] = pd.to_numeric(df["fatcot"], errors="coerce")
 
         return df.reset_index(drop=True)
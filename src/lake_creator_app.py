@@ -3,6 +3,7 @@ import logging
 from dotenv import load_dotenv
 
 from service.db.md_lake import MotherDuckLakeService
+from service.snapshot import MarketSnapshotService
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
@@ -10,11 +11,13 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(mess
 class LakeCreatorApp(object):
     def __init__(self):
         load_dotenv()
-        self._lake_service = MotherDuckLakeService()
+        # Rebuilt latest features are published to the snapshot the API workers read from
+        self._lake_service = MotherDuckLakeService(MarketSnapshotService())
 
     def main(self):
         # self._lake_service.create_b3_lake()
-        self._lake_service.create_b3_featured_lake()
+        # Rebuild into a shadow table and swap it in, so API readers never see a partial b3_featured
+        self._lake_service.create_b3_featured_lake(shadow=True)
 
 
 if __name__ == '__main__':
@@ -1,3 +1,5 @@
+from datetime import date
+
 from service.db.asset import AssetService
 
 
@@ -5,16 +7,42 @@ class AssetApiHandler:
     def __init__(self, asset_service: AssetService):
         self._asset_service = asset_service
 
-    def get_asset(self, ticker):
+    def get_asset(self, ticker, as_arrow=False):
         # Business logic, validation, and payload manipulation for get_asset
         if not ticker or not isinstance(ticker, str):
             return {'error': 'Invalid ticker', 'message': 'Ticker must be a non-empty string'}, 400
-        asset_data = self._asset_service.get_asset(ticker)
+        asset_data = self._asset_service.get_asset(ticker, as_arrow=as_arrow)
         if asset_data is None:
             return {'error': 'Asset not found', 'ticker': ticker}, 404
+        if as_arrow:
+            return asset_data, 200
         return {'ticker': ticker, 'data': asset_data}, 200
 
-    def list_assets(self, search_term, page, page_size):
+    def get_asset_range(self, ticker, start_date, end_date, columns):
+        # Validation for the point-in-time range query; returns a record batch reader on success
+        if not ticker or not isinstance(ticker, str):
+            return {'error': 'Invalid ticker', 'message': 'Ticker must be a non-empty string'}, 400
+        try:
+            start = date.fromisoformat(start_date) if start_date else None
+            end = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return {'error': 'Invalid date', 'message': 'Dates must be in YYYY-MM-DD format'}, 400
+        if start and end and start > end:
+            return {'error': 'Invalid date range', 'message': 'start must not be after end'}, 400
+        try:
+            reader = self._asset_service.get_asset_range(
+                ticker,
+                start_date=start.isoformat() if start else None,
+                end_date=end.isoformat() if end else None,
+                columns=columns
+            )
+            return reader, 200
+        except ValueError as e:
+            return {'error': 'Invalid columns', 'message': str(e)}, 400
+        except Exception as e:
+            return {'error': 'Internal server error', 'message': str(e)}, 500
+
+    def list_assets(self, search_term, page, page_size, as_arrow=False):
         # Business logic, validation, and payload manipulation for list_assets
         if page < 1:
             return {'error': 'Invalid page number', 'message': 'Page must be greater than 0'}, 400
@@ -26,7 +54,8 @@ class AssetApiHandler:
             result = self._asset_service.list_assets(
                 search_term=search_term if search_term else None,
                 page=page,
-                page_size=page_size
+                page_size=page_size,
+                as_arrow=as_arrow
             )
             return result, 200
         except Exception as e:
@@ -1,26 +1,47 @@
 from service.db.md_lake import MotherDuckLakeService
 from service.scrapper import B3ScrapperService
+from service.snapshot import MarketSnapshotService
 
 
 class AssetService:
-    def __init__(self, md_lake: MotherDuckLakeService, scrapper: B3ScrapperService):
+    def __init__(self, md_lake: MotherDuckLakeService, scrapper: B3ScrapperService,
+                 snapshot: MarketSnapshotService = None):
         self._scrapper = scrapper
         self._md_lake = md_lake
+        self._snapshot = snapshot
 
-    def get_asset(self, ticker: str, target_date: str = None):
+    def get_asset(self, ticker: str, target_date: str = None, as_arrow: bool = False):
         """
-        Get a single asset with all features calculated using historical context from the data lake.
+        Get a single asset with all features. The latest day is looked up in the features precomputed at ingest
+        (shared market snapshot, then b3_latest_features); otherwise features are calculated using historical
+        context from the data lake.
         
         Args:
             ticker: Asset ticker symbol
             target_date: Specific date to get data for (YYYY-MM-DD format). If None, gets latest available.
+            as_arrow: Return a pyarrow Table instead of a dictionary
             
         Returns:
-            Dictionary with transformed asset data including all engineered features
+            Dictionary (or single-row pyarrow Table) with transformed asset data including all engineered features
         """
-        # First, get the single asset data from scrapper
-        b3_data = self._scrapper.fetch_data()
-        asset_data = b3_data[b3_data['ticker'].str.strip() == ticker.upper()]
+        # Latest day: served from the features precomputed at ingest
+        if not target_date:
+            # A published snapshot holds the same rows as b3_latest_features, so there is no fallback past it
+            if self._snapshot and self._snapshot.has_latest_features():
+                latest = self._snapshot.get_latest_features(ticker)
+            else:
+                latest = self._md_lake.get_latest_features(ticker)
+            if latest is not None:
+                if as_arrow:
+                    import pyarrow as pa
+                    return pa.Table.from_pylist([latest])
+                return latest
+
+        # First, get the single asset data from the shared snapshot, or from scrapper if none was published
+        asset_data = self._snapshot.get_market_rows(ticker) if self._snapshot else None
+        if asset_data is None:
+            b3_data = self._scrapper.fetch_data()
+            asset_data = b3_data[b3_data['ticker'].str.strip() == ticker.upper()]
 
         # Fallback if asset_data is None or empty
         if asset_data is None or asset_data.empty:
@@ -44,10 +65,38 @@ class AssetService:
         if transformed_data.empty:
             return None
 
+        if as_arrow:
+            import pyarrow as pa
+            return pa.Table.from_pandas(transformed_data, preserve_index=False)
+
         # Convert to dict for JSON serialization
         return transformed_data.to_dict('records')[0]
 
-    def list_assets(self, search_term: str = None, page: int = 1, page_size: int = 20):
+    def get_asset_range(self, ticker: str, start_date: str = None, end_date: str = None, columns: list = None):
+        """
+        Get precomputed features for a ticker over a date range, straight from b3_featured.
+
+        Args:
+            ticker: Asset ticker symbol
+            start_date: Inclusive lower bound (YYYY-MM-DD). If None, starts at the earliest row.
+            end_date: Inclusive upper bound (YYYY-MM-DD). If None, ends at the latest row.
+            columns: Feature columns to return. If None, all columns are returned.
+
+        Returns:
+            pyarrow.RecordBatchReader streaming the rows ordered by date
+        """
+        available = self._md_lake.get_b3_featured_columns()
+        if columns:
+            unknown = [col for col in columns if col not in available]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+            # Always keep the point-in-time keys
+            columns = [col for col in ('date', 'ticker') if col not in columns] + list(columns)
+        else:
+            columns = available
+        return self._md_lake.stream_b3_featured_range(ticker, columns, start_date, end_date)
+
+    def list_assets(self, search_term: str = None, page: int = 1, page_size: int = 20, as_arrow: bool = False):
         """
         List available assets from b3_featured table with search and pagination.
         
@@ -55,6 +104,7 @@ class AssetService:
             search_term: Search term to filter assets (minimum 3 characters)
             page: Page number (1-based)
             page_size: Number of items per page
+            as_arrow: Return the asset page as a pyarrow Table (straight from DuckDB) instead of a list of dicts
             
         Returns:
             Dictionary with paginated asset list and metadata
@@ -88,10 +138,11 @@ class AssetService:
 
             # Get paginated results
             paginated_query = f"{base_query} LIMIT {page_size} OFFSET {offset}"
-            results = md_lake._md.execute(paginated_query).df()
-
-            # Convert to list of dictionaries
-            assets = results.to_dict('records')
+            if as_arrow:
+                assets = md_lake._md.execute(paginated_query).fetch_arrow_table()
+            else:
+                # Convert to list of dictionaries
+                assets = md_lake._md.execute(paginated_query).df().to_dict('records')
 
             # Calculate pagination metadata
             total_pages = (total_count + page_size - 1) // page_size
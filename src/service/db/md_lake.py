@@ -1,47 +1,263 @@
 import logging
+import os
+import threading
 
 import duckdb
 import pandas as pd
 
 from b3.parser import B3HistFileParser
 from b3.transformer import B3Transformer
+from service.snapshot import MarketSnapshotService
 from service.db.md_query import (
     CREATE_B3_HIST_FROM_DF,
-    CREATE_B3_FEATURED_FROM_DF,
     CREATE_B3_HIST_FROM_B3_DATA,
     INSERT_OR_REPLACE_B3_HIST,
-    SELECT_ALL_B3_HIST,
+    ADD_B3_HIST_FATCOT_COLUMN,
+    CREATE_B3_ADJUSTMENT_FACTORS,
+    DELETE_B3_HIST_ADJUSTED_FOR_B3_DATA,
+    DELETE_B3_HIST_ADJUSTED_FOR_CHANGED_TICKERS,
+    REPLACE_B3_ADJUSTMENT_FACTORS,
+    SELECT_ALL_B3_HIST_ADJUSTED,
+    CREATE_OR_REPLACE_B3_LATEST_FEATURES_FROM_DF,
+    SELECT_B3_LATEST_FEATURES,
+    CREATE_CHANGED_ADJUSTMENT_TICKERS,
+    SELECT_CHANGED_ADJUSTMENT_TICKERS_COUNT,
+    SELECT_FILE_ADJUSTMENT_FACTORS,
     SELECT_B3_HIST_COUNT,
     SELECT_B3_HIST_MAX_DATE,
     SELECT_B3_HIST_MIN_DATE,
+    DESCRIBE_B3_FEATURED,
+    B3_FEATURED,
+    B3_FEATURED_SHADOW,
+    DROP_B3_FEATURED_SHADOW,
+    SELECT_B3_HIST_ADJUSTED_MAX_DATE,
+    SWAP_B3_FEATURED_SHADOW,
+    select_table_coverage_query,
+    create_b3_featured_with_cross_section_from_df,
+    create_adjustment_factors_staging_query,
+    create_b3_hist_adjusted_query,
+    insert_b3_hist_adjusted_query,
+    latest_history_rows_query,
     primary_query,
     fallback_query,
-    fetch_latest_asset_row_query
+    fetch_latest_asset_row_query,
+    select_b3_featured_range_query
 )
 
 
 class MotherDuckLakeService(object):
-    def __init__(self):
+    # History rows (incl. the target row) needed for every feature to be defined
+    REQUIRED_HISTORY_ROWS = B3Transformer.required_history_rows()
+    # A shadow rebuild may not shrink b3_featured below this share of its current rows
+    SHADOW_MIN_ROW_RATIO = 0.95
+
+    def __init__(self, snapshot: MarketSnapshotService = None):
         self._b3_parser = B3HistFileParser(file_path='assets/COTAHIST_M082025.txt')
-        self._md = duckdb.connect('md:b3')
+        self._snapshot = snapshot
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._b3_featured_columns = None
+        self._latest_features = None
+        self._latest_features_lock = threading.Lock()
+
+    @property
+    def _md(self):
+        """
+        MotherDuck connection, opened on first use so constructing the service does not hit the network.
+        """
+        if self._connection is None:
+            with self._connection_lock:
+                if self._connection is None:
+                    logging.info("Opening MotherDuck connection..")
+                    self._connection = duckdb.connect('md:b3')
+        return self._connection
+
+    def ping(self) -> bool:
+        """
+        Check that the MotherDuck connection can be opened and answers a trivial query.
+        """
+        try:
+            return self._md.execute("SELECT 1").fetchone()[0] == 1
+        except Exception as e:
+            logging.error(f"MotherDuck ping failed: {e}")
+            return False
 
     def create_b3_lake(self):
         df = self._b3_parser.parse_b3_hist_quota()
         self._md.execute(CREATE_B3_HIST_FROM_DF())
 
-    def create_b3_featured_lake(self):
+    def create_b3_featured_lake(self, shadow: bool = False):
+        """
+        Create the b3_featured table from b3_hist_adjusted.
+
+        Args:
+            shadow: Rebuild into b3_featured__next, validate it and atomically swap it in place of b3_featured,
+                so readers keep querying the previous version until the swap. Without it the table is only
+                created when it does not exist yet.
+        """
         logging.info("Creating B3 featured lake..")
-        df = B3Transformer.transform_b3_hist_quota(self._md.execute(SELECT_ALL_B3_HIST).df())
-        self._md.execute(CREATE_B3_FEATURED_FROM_DF)
+        self.refresh_adjusted_prices()
+        df = B3Transformer.transform_b3_hist_quota(self._md.execute(SELECT_ALL_B3_HIST_ADJUSTED).df())
+        # Per-ticker features come from the transformer, market-wide ones are computed in DuckDB over b3_hist_adjusted
+        if shadow:
+            self._md.execute(create_b3_featured_with_cross_section_from_df(table=B3_FEATURED_SHADOW, replace=True))
+            self._swap_b3_featured_shadow()
+        else:
+            self._md.execute(create_b3_featured_with_cross_section_from_df())
+        self._b3_featured_columns = None
+        self.refresh_latest_features()
+
+    def _table_coverage(self, table: str):
+        """
+        Row count, min date and max date of a table, or None if the table does not exist.
+        """
+        try:
+            return self._md.execute(select_table_coverage_query(table)).fetchone()
+        except duckdb.CatalogException:
+            return None
 
-    def fetch_asset_with_historical_context(self, single_asset_data: pd.DataFrame, days_back: int = 30) -> pd.DataFrame:
+    def _validate_b3_featured_shadow(self):
+        """
+        Check that b3_featured__next is complete enough to replace b3_featured.
+
+        Raises:
+            ValueError: If the shadow table is empty, lost rows or date coverage compared to the live table,
+                or does not reach the latest date in b3_hist_adjusted
+        """
+        shadow_count, shadow_min, shadow_max = self._table_coverage(B3_FEATURED_SHADOW)
+        if not shadow_count:
+            raise ValueError(f"{B3_FEATURED_SHADOW} is empty")
+
+        latest_date = self._md.execute(SELECT_B3_HIST_ADJUSTED_MAX_DATE).fetchone()[0]
+        if latest_date and shadow_max < latest_date:
+            raise ValueError(f"{B3_FEATURED_SHADOW} ends at {shadow_max}, b3_hist_adjusted at {latest_date}")
+
+        live = self._table_coverage(B3_FEATURED)
+        if live and live[0]:
+            live_count, live_min, live_max = live
+            if shadow_count < live_count * self.SHADOW_MIN_ROW_RATIO:
+                raise ValueError(f"{B3_FEATURED_SHADOW} has {shadow_count} rows, {B3_FEATURED} has {live_count}")
+            if shadow_min > live_min or shadow_max < live_max:
+                raise ValueError(f"{B3_FEATURED_SHADOW} covers {shadow_min}..{shadow_max}, "
+                                 f"{B3_FEATURED} covers {live_min}..{live_max}")
+        logging.info(f"Validated {B3_FEATURED_SHADOW}: {shadow_count} rows from {shadow_min} to {shadow_max}")
+
+    def _swap_b3_featured_shadow(self):
+        """
+        Validate b3_featured__next and replace b3_featured with it in a single transaction.
+        The shadow table is dropped if validation fails, leaving b3_featured untouched.
+        """
+        try:
+            self._validate_b3_featured_shadow()
+        except ValueError:
+            self._md.execute(DROP_B3_FEATURED_SHADOW)
+            raise
+
+        self._md.execute("BEGIN TRANSACTION")
+        try:
+            for statement in SWAP_B3_FEATURED_SHADOW:
+                self._md.execute(statement)
+            self._md.execute("COMMIT")
+        except Exception:
+            self._md.execute("ROLLBACK")
+            raise
+        logging.info(f"Swapped {B3_FEATURED_SHADOW} into {B3_FEATURED}")
+
+    def refresh_latest_features(self):
+        """
+        Rebuild b3_latest_features with exactly one featured row per ticker (its most recent date),
+        reload the in-memory lookup from it and publish it to the shared market snapshot, if configured.
+        """
+        logging.info("Refreshing B3 latest features..")
+        history = self._md.execute(latest_history_rows_query(self.REQUIRED_HISTORY_ROWS)).df()
+        featured = B3Transformer.transform_b3_hist_quota(history)
+        latest_df = featured.sort_values(['ticker', 'date']).groupby('ticker', sort=False).tail(1)
+        self._md.execute(CREATE_OR_REPLACE_B3_LATEST_FEATURES_FROM_DF)
+        self._latest_features = self._to_latest_features_dict(latest_df)
+        logging.info(f"Loaded latest features for {len(self._latest_features)} tickers")
+        if self._snapshot is not None:
+            self._snapshot.publish(latest_features=latest_df)
+
+    def load_latest_features(self):
+        """
+        Load b3_latest_features into memory, unless already loaded. A missing table yields an empty lookup.
+        """
+        if self._latest_features is not None:
+            return
+        with self._latest_features_lock:
+            if self._latest_features is not None:
+                return
+            try:
+                latest_df = self._md.execute(SELECT_B3_LATEST_FEATURES).df()
+            except duckdb.CatalogException:
+                logging.warning("b3_latest_features table not found, latest feature lookups disabled until next ingest")
+                latest_df = pd.DataFrame()
+            self._latest_features = self._to_latest_features_dict(latest_df)
+
+    def get_latest_features(self, ticker: str):
+        """
+        Precomputed latest featured row for a ticker.
+
+        Returns:
+            Dictionary with the row, or None if the ticker is not in b3_latest_features
+        """
+        self.load_latest_features()
+        return self._latest_features.get(ticker.strip().upper())
+
+    @staticmethod
+    def _to_latest_features_dict(latest_df: pd.DataFrame) -> dict:
+        if latest_df.empty:
+            return {}
+        return {str(record['ticker']).strip().upper(): record for record in latest_df.to_dict('records')}
+
+    def get_b3_featured_columns(self) -> list:
+        """
+        Column names of the b3_featured table, cached after the first lookup.
+        """
+        if self._b3_featured_columns is None:
+            cursor = self._md.cursor()
+            try:
+                cursor.execute(DESCRIBE_B3_FEATURED)
+                self._b3_featured_columns = [desc[0] for desc in cursor.description]
+            finally:
+                cursor.close()
+        return self._b3_featured_columns
+
+    def stream_b3_featured_range(self, ticker: str, columns: list, start_date: str = None, end_date: str = None,
+                                 batch_size: int = 10000):
+        """
+        Stream precomputed b3_featured rows for a ticker over a date range.
+
+        Args:
+            ticker: Asset ticker symbol
+            columns: Columns to project (already validated against b3_featured)
+            start_date: Inclusive lower bound (YYYY-MM-DD), or None for no bound
+            end_date: Inclusive upper bound (YYYY-MM-DD), or None for no bound
+            batch_size: Rows per Arrow record batch
+
+        Returns:
+            pyarrow.RecordBatchReader over the matching rows, ordered by date
+        """
+        params = [ticker.strip().upper()]
+        if start_date:
+            params.append(start_date)
+        if end_date:
+            params.append(end_date)
+        # Own cursor so the stream does not interfere with other requests sharing the connection
+        cursor = self._md.cursor()
+        cursor.execute(select_b3_featured_range_query(columns, start_date, end_date), params)
+        return cursor.fetch_record_batch(batch_size)
+
+    def fetch_asset_with_historical_context(self, single_asset_data: pd.DataFrame, days_back: int = 30,
+                                            features: list = None) -> pd.DataFrame:
         """
         Fetches historical data for a single asset to complement it with enough context
-        for the transform_b3_hist_quota method to calculate all features.
+        for the transform_b3_hist_quota method to calculate the selected features.
 
         Args:
             single_asset_data: DataFrame with a single row containing asset data
             days_back: Number of days of historical data to fetch (default 30 to ensure all features can be calculated)
+            features: Features that will be computed (default: all); sets how many history rows are required
 
         Returns:
             DataFrame with the single asset data plus historical context
@@ -71,14 +287,16 @@ class MotherDuckLakeService(object):
             # Remove the single asset date if it exists to avoid duplicates later
             historical_data = historical_data[historical_data['date'] != target_date]
 
-            # Determine required history size for features (26 total incl. target row)
-            required_rows = 26
+            # Determine required history size for features (incl. target row)
+            required_rows = self.REQUIRED_HISTORY_ROWS if features is None \
+                else B3Transformer.required_history_rows(features)
             required_hist_rows = max(1, required_rows - 1)
 
-            # Fallback: fetch most recent older rows before target_date if window is sparse
+            # Fallback: fetch most recent older rows before the window if it is sparse
             if len(historical_data) < required_hist_rows:
                 missing = required_hist_rows - len(historical_data)
-                fallback_query_str = fallback_query(ticker, target_date, missing)
+                window_start = historical_data['date'].min() if not historical_data.empty else target_date
+                fallback_query_str = fallback_query(ticker, window_start, missing)
                 older_data = self._md.execute(fallback_query_str).df()
                 if not older_data.empty:
                     historical_data = pd.concat([older_data, historical_data], ignore_index=True)
@@ -103,22 +321,24 @@ class MotherDuckLakeService(object):
             logging.error(f"Error fetching historical data for {ticker}: {str(e)}")
             return single_asset_data
 
-    def transform_single_asset_with_context(self, single_asset_data: pd.DataFrame, days_back: int = 30) -> pd.DataFrame:
+    def transform_single_asset_with_context(self, single_asset_data: pd.DataFrame, days_back: int = 30,
+                                            features: list = None) -> pd.DataFrame:
         """
         Convenience method that fetches historical context and applies transformation to a single asset.
         
         Args:
             single_asset_data: DataFrame with a single row containing asset data
             days_back: Number of days of historical data to fetch
+            features: Features to compute (default: all), only their dependency subgraph is evaluated
             
         Returns:
             Transformed DataFrame with features calculated
         """
         # Get historical context
-        asset_with_context = self.fetch_asset_with_historical_context(single_asset_data, days_back)
+        asset_with_context = self.fetch_asset_with_historical_context(single_asset_data, days_back, features)
 
         # Apply transformation
-        transformed_data = B3Transformer.transform_b3_hist_quota(asset_with_context)
+        transformed_data = B3Transformer.transform_b3_hist_quota(asset_with_context, features)
 
         # Return only the row for the original date if it exists
         if not single_asset_data.empty:
@@ -136,7 +356,71 @@ class MotherDuckLakeService(object):
         Creates the table if it does not exist, then inserts or replaces data.
         """
         self._md.execute(CREATE_B3_HIST_FROM_B3_DATA)
-        self._md.execute(INSERT_OR_REPLACE_B3_HIST)
+        self.refresh_adjusted_prices(b3_data)
+        self.refresh_latest_features()
+
+    @staticmethod
+    def _load_adjustment_factors_file():
+        """
+        Read corporate action factors (splits, groupings) from the CSV pointed to by B3_ADJUSTMENT_FACTORS_FILE.
+        Expected columns: ticker, ex_date (YYYY-MM-DD), factor. The factor multiplies prices of rows before
+        ex_date, e.g. 0.5 for a 2-for-1 split and 10 for a 10-to-1 grouping.
+
+        Returns:
+            DataFrame with ticker, ex_date, factor and source, or None if no file is configured
+        """
+        file_path = os.getenv('B3_ADJUSTMENT_FACTORS_FILE')
+        if not file_path:
+            return None
+        if not os.path.exists(file_path):
+            logging.warning(f"Adjustment factors file {file_path} not found, keeping stored file factors")
+            return None
+        factors = pd.read_csv(file_path, dtype={'ticker': str})
+        factors['ticker'] = factors['ticker'].str.strip().str.upper()
+        factors['ex_date'] = pd.to_datetime(factors['ex_date']).dt.date
+        factors['factor'] = pd.to_numeric(factors['factor'], errors='coerce')
+        factors['source'] = 'FILE'
+        return factors[['ticker', 'ex_date', 'factor', 'source']].dropna()
+
+    def refresh_adjusted_prices(self, b3_data: pd.DataFrame = None):
+        """
+        Sync b3_adjustment_factors and incrementally refresh the b3_hist_adjusted table.
+
+        Factors come from FATCOT changes in b3_hist plus the optional local factors file. Tickers whose
+        factors changed are fully re-adjusted; for every other ticker only new b3_hist rows are appended.
+
+        Args:
+            b3_data: New B3 rows to insert or replace in b3_hist first, in the same transaction. Their
+                (ticker, date) keys are re-adjusted, so a re-ingested day with corrected values replaces
+                the stale adjusted rows.
+        """
+        logging.info("Refreshing adjusted prices..")
+        file_factors = self._load_adjustment_factors_file()
+        file_factors_query = "SELECT * FROM file_factors" if file_factors is not None \
+            else SELECT_FILE_ADJUSTMENT_FACTORS
+
+        self._md.execute(ADD_B3_HIST_FATCOT_COLUMN)
+        self._md.execute(CREATE_B3_ADJUSTMENT_FACTORS)
+        self._md.execute("BEGIN TRANSACTION")
+        try:
+            if b3_data is not None:
+                self._md.execute(INSERT_OR_REPLACE_B3_HIST)
+            self._md.execute(create_adjustment_factors_staging_query(file_factors_query))
+            self._md.execute(CREATE_CHANGED_ADJUSTMENT_TICKERS)
+            changed = self._md.execute(SELECT_CHANGED_ADJUSTMENT_TICKERS_COUNT).fetchone()[0]
+            self._md.execute(REPLACE_B3_ADJUSTMENT_FACTORS)
+
+            self._md.execute(create_b3_hist_adjusted_query())
+            if changed:
+                logging.info(f"Adjustment factors changed for {changed} tickers, re-adjusting their history")
+                self._md.execute(DELETE_B3_HIST_ADJUSTED_FOR_CHANGED_TICKERS)
+            if b3_data is not None:
+                self._md.execute(DELETE_B3_HIST_ADJUSTED_FOR_B3_DATA)
+            self._md.execute(insert_b3_hist_adjusted_query())
+            self._md.execute("COMMIT")
+        except Exception:
+            self._md.execute("ROLLBACK")
+            raise
 
     def get_b3_hist_stats(self):
         """
@@ -4,18 +4,70 @@ def CREATE_B3_HIST_FROM_DF():
     return "CREATE TABLE IF NOT EXISTS b3_hist AS SELECT * FROM df"
 
 
-CREATE_B3_FEATURED_FROM_DF = "CREATE TABLE IF NOT EXISTS b3_featured AS SELECT * FROM df"
 CREATE_B3_HIST_FROM_B3_DATA = "CREATE TABLE IF NOT EXISTS b3_hist AS SELECT * FROM b3_data LIMIT 0"
 INSERT_OR_REPLACE_B3_HIST = "INSERT OR REPLACE INTO b3_hist SELECT * FROM b3_data"
-SELECT_ALL_B3_HIST = "SELECT * FROM b3_hist"
 SELECT_B3_HIST_COUNT = "SELECT COUNT(*) FROM b3_hist"
 SELECT_B3_HIST_MAX_DATE = "SELECT MAX(date) FROM b3_hist"
 SELECT_B3_HIST_MIN_DATE = "SELECT MIN(date) FROM b3_hist"
+# No default: rows ingested before FATCOT was parsed stay NULL and never produce a FATCOT event
+ADD_B3_HIST_FATCOT_COLUMN = "ALTER TABLE b3_hist ADD COLUMN IF NOT EXISTS fatcot DOUBLE"
+SELECT_ALL_B3_HIST_ADJUSTED = "SELECT * FROM b3_hist_adjusted"
+CREATE_OR_REPLACE_B3_LATEST_FEATURES_FROM_DF = "CREATE OR REPLACE TABLE b3_latest_features AS SELECT * FROM latest_df"
+SELECT_B3_LATEST_FEATURES = "SELECT * FROM b3_latest_features"
+
+ADJUSTED_PRICE_COLUMNS = ['open', 'high', 'low', 'avg', 'close', 'best_buy', 'best_sell']
+
+CREATE_B3_ADJUSTMENT_FACTORS = """
+CREATE TABLE IF NOT EXISTS b3_adjustment_factors (
+    ticker VARCHAR,
+    ex_date DATE,
+    factor DOUBLE,
+    source VARCHAR
+)
+"""
+# Price factor changes in COTAHIST: rows before ex_date are rescaled to the new quotation unit
+SELECT_FATCOT_ADJUSTMENT_FACTORS = """
+SELECT ticker, CAST(date AS DATE) AS ex_date, fatcot / prev_fatcot AS factor, 'FATCOT' AS source
+FROM (
+    SELECT TRIM(ticker) AS ticker,
+           date,
+           fatcot,
+           LAG(fatcot) OVER (PARTITION BY TRIM(ticker) ORDER BY date) AS prev_fatcot
+    FROM b3_hist
+)
+WHERE prev_fatcot > 0 AND fatcot > 0 AND fatcot <> prev_fatcot
+"""
+SELECT_FILE_ADJUSTMENT_FACTORS = "SELECT ticker, ex_date, factor, source FROM b3_adjustment_factors WHERE source = 'FILE'"
+CREATE_CHANGED_ADJUSTMENT_TICKERS = """
+CREATE OR REPLACE TEMP TABLE changed_adjustment_tickers AS
+SELECT DISTINCT ticker FROM (
+    (SELECT ticker, ex_date, factor, source FROM adjustment_factors_staging
+     EXCEPT SELECT ticker, ex_date, factor, source FROM b3_adjustment_factors)
+    UNION ALL
+    (SELECT ticker, ex_date, factor, source FROM b3_adjustment_factors
+     EXCEPT SELECT ticker, ex_date, factor, source FROM adjustment_factors_staging)
+)
+"""
+SELECT_CHANGED_ADJUSTMENT_TICKERS_COUNT = "SELECT COUNT(*) FROM changed_adjustment_tickers"
+REPLACE_B3_ADJUSTMENT_FACTORS = """
+DELETE FROM b3_adjustment_factors;
+INSERT INTO b3_adjustment_factors SELECT ticker, ex_date, factor, source FROM adjustment_factors_staging;
+"""
+DELETE_B3_HIST_ADJUSTED_FOR_CHANGED_TICKERS = """
+DELETE FROM b3_hist_adjusted WHERE TRIM(ticker) IN (SELECT ticker FROM changed_adjustment_tickers)
+"""
+# Re-ingested (ticker, date) keys are re-adjusted from their corrected b3_hist values
+DELETE_B3_HIST_ADJUSTED_FOR_B3_DATA = """
+DELETE FROM b3_hist_adjusted
+WHERE EXISTS (
+    SELECT 1 FROM b3_data b WHERE b.ticker = b3_hist_adjusted.ticker AND b.date = b3_hist_adjusted.date
+)
+"""
 
 
 def primary_query(ticker, target_date, days_back):
     return f"""
-    SELECT * FROM b3_hist 
+    SELECT * FROM b3_hist_adjusted 
     WHERE TRIM(ticker) = '{ticker}' 
     AND date <= CAST('{target_date}' AS DATE)
     AND date >= CAST('{target_date}' AS DATE) - INTERVAL {days_back} DAY
@@ -26,7 +78,7 @@ def primary_query(ticker, target_date, days_back):
 def fallback_query(ticker, target_date, missing):
     return f"""
     SELECT * FROM (
-        SELECT * FROM b3_hist
+        SELECT * FROM b3_hist_adjusted
         WHERE TRIM(ticker) = '{ticker}'
         AND date < CAST('{target_date}' AS DATE)
         ORDER BY date DESC
@@ -38,8 +90,185 @@ def fallback_query(ticker, target_date, missing):
 
 def fetch_latest_asset_row_query(ticker):
     return f"""
-    SELECT * FROM b3_hist
+    SELECT * FROM b3_hist_adjusted
     WHERE TRIM(ticker) = '{ticker.strip().upper()}'
     ORDER BY date DESC
     LIMIT 1
     """
+
+
+DESCRIBE_B3_FEATURED = "SELECT * FROM b3_featured LIMIT 0"
+
+B3_FEATURED = "b3_featured"
+B3_FEATURED_SHADOW = "b3_featured__next"
+SELECT_B3_HIST_ADJUSTED_MAX_DATE = "SELECT CAST(MAX(date) AS DATE) FROM b3_hist_adjusted"
+DROP_B3_FEATURED_SHADOW = f"DROP TABLE IF EXISTS {B3_FEATURED_SHADOW}"
+SWAP_B3_FEATURED_SHADOW = [
+    f"DROP TABLE IF EXISTS {B3_FEATURED}",
+    f"ALTER TABLE {B3_FEATURED_SHADOW} RENAME TO {B3_FEATURED}",
+]
+
+
+def select_table_coverage_query(table):
+    return f"SELECT COUNT(*), CAST(MIN(date) AS DATE), CAST(MAX(date) AS DATE) FROM {table}"
+
+
+def select_b3_featured_range_query(columns, start_date=None, end_date=None):
+    """
+    Point-in-time range over b3_featured for a single ticker. Only the requested columns are selected
+    and the date range is applied in the WHERE clause so both are pushed down to the scan.
+    Parameters: ticker, then start_date / end_date when given.
+    """
+    select_cols = ', '.join(f'"{col}"' for col in columns)
+    query = f"""
+    SELECT {select_cols} FROM b3_featured
+    WHERE TRIM(ticker) = ?
+    """
+    if start_date:
+        query += " AND date >= CAST(? AS DATE)"
+    if end_date:
+        query += " AND date <= CAST(? AS DATE)"
+    return query + " ORDER BY date ASC"
+
+
+def cross_sectional_features_query(beta_window=20, bdi_codes=(2,)):
+    """
+    Market-wide features over b3_hist_adjusted, computed with window functions in a single pass:
+    per-date rank / percentile / z-score of close-to-close returns and volume (z-score on log volume),
+    the turnover-weighted market return of the day and each ticker's rolling beta to it.
+    The universe is limited to the given COTAHIST BDI codes, by default 02 (standard-lot cash equities),
+    so options, fractional lots and forward contracts do not drive the market return, ranks or betas.
+    """
+    bdi_filter = ', '.join(str(int(code)) for code in bdi_codes)
+    return f"""
+    WITH returns AS (
+        SELECT TRIM(ticker) AS ticker,
+               date,
+               volume,
+               turnover,
+               close / LAG(close) OVER (PARTITION BY TRIM(ticker) ORDER BY date) - 1 AS cs_return
+        FROM b3_hist_adjusted
+        WHERE TRY_CAST(bdi_code AS INTEGER) IN ({bdi_filter})
+    ),
+    cross_section AS (
+        SELECT *,
+               SUM(turnover * cs_return) OVER (PARTITION BY date)
+                   / NULLIF(SUM(turnover) OVER (PARTITION BY date), 0) AS market_return
+        FROM returns
+        WHERE cs_return IS NOT NULL AND isfinite(cs_return) AND turnover > 0
+    )
+    SELECT ticker,
+           date,
+           RANK() OVER by_date_return AS return_rank,
+           PERCENT_RANK() OVER (PARTITION BY date ORDER BY cs_return) AS return_pct_rank,
+           (cs_return - AVG(cs_return) OVER by_date)
+               / NULLIF(STDDEV_SAMP(cs_return) OVER by_date, 0) AS return_zscore,
+           RANK() OVER (PARTITION BY date ORDER BY volume DESC) AS volume_rank,
+           PERCENT_RANK() OVER (PARTITION BY date ORDER BY volume) AS volume_pct_rank,
+           (LN(1 + volume) - AVG(LN(1 + volume)) OVER by_date)
+               / NULLIF(STDDEV_SAMP(LN(1 + volume)) OVER by_date, 0) AS volume_zscore,
+           market_return,
+           CASE WHEN REGR_COUNT(cs_return, market_return) OVER beta_window = {beta_window}
+                THEN REGR_SLOPE(cs_return, market_return) OVER beta_window
+           END AS beta_{beta_window}
+    FROM cross_section
+    WINDOW by_date AS (PARTITION BY date),
+           by_date_return AS (PARTITION BY date ORDER BY cs_return DESC),
+           beta_window AS (PARTITION BY ticker ORDER BY date ROWS BETWEEN {beta_window - 1} PRECEDING AND CURRENT ROW)
+    """
+
+
+def create_b3_featured_with_cross_section_from_df(beta_window=20, table=B3_FEATURED, replace=False):
+    """
+    Create b3_featured (or its shadow table) from the per-ticker features in df,
+    with the cross-sectional features appended.
+    """
+    create = f"CREATE OR REPLACE TABLE {table}" if replace else f"CREATE TABLE IF NOT EXISTS {table}"
+    return f"""
+    {create} AS
+    SELECT f.*, c.* EXCLUDE (ticker, date)
+    FROM df f
+    LEFT JOIN ({cross_sectional_features_query(beta_window)}) c
+        ON TRIM(f.ticker) = c.ticker AND CAST(f.date AS DATE) = CAST(c.date AS DATE)
+    ORDER BY f.ticker, f.date
+    """
+
+
+def create_adjustment_factors_staging_query(file_factors_query):
+    """
+    Stage the full set of adjustment factors: FATCOT changes derived from b3_hist plus the file-supplied ones.
+    """
+    return f"""
+    CREATE OR REPLACE TEMP TABLE adjustment_factors_staging AS
+    {SELECT_FATCOT_ADJUSTMENT_FACTORS}
+    UNION ALL
+    {file_factors_query}
+    """
+
+
+def b3_hist_adjusted_query(incremental=False):
+    """
+    b3_hist with prices scaled by the cumulative product of every adjustment factor whose ex_date is after
+    the row date. Volume (QUATOT, a count of securities) is only scaled, inversely, by FILE factors
+    (splits / groupings); FATCOT changes alter the quotation unit, not the share count, so they rescale prices only.
+    Each row is matched with an ASOF join to the next event of its ticker, which already carries the
+    products of all later events. With incremental=True only rows not yet in b3_hist_adjusted are selected.
+    """
+    price_replace = ',\n            '.join(
+        f"h.{col} * COALESCE(e.cum_factor, 1) AS {col}" for col in ADJUSTED_PRICE_COLUMNS
+    )
+    where = """
+        WHERE NOT EXISTS (
+            SELECT 1 FROM b3_hist_adjusted a WHERE a.ticker = b3_hist.ticker AND a.date = b3_hist.date
+        )""" if incremental else ""
+    return f"""
+    WITH events AS (
+        SELECT ticker,
+               ex_date,
+               PRODUCT(factor) OVER later_events AS cum_factor,
+               PRODUCT(volume_factor) OVER later_events AS cum_volume_factor
+        FROM (
+            SELECT ticker,
+                   ex_date,
+                   PRODUCT(factor) AS factor,
+                   PRODUCT(CASE WHEN source = 'FILE' THEN factor ELSE 1 END) AS volume_factor
+            FROM b3_adjustment_factors
+            GROUP BY ticker, ex_date
+        )
+        WINDOW later_events AS (PARTITION BY ticker ORDER BY ex_date DESC
+                                ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+    ),
+    hist AS (
+        SELECT *, TRIM(ticker) AS adj_ticker, CAST(date AS DATE) AS adj_date FROM b3_hist{where}
+    )
+    SELECT h.* EXCLUDE (adj_ticker, adj_date) REPLACE (
+            {price_replace},
+            CAST(ROUND(h.volume / COALESCE(e.cum_volume_factor, 1)) AS BIGINT) AS volume
+        ),
+        COALESCE(e.cum_factor, 1) AS adj_factor,
+        COALESCE(e.cum_volume_factor, 1) AS adj_volume_factor
+    FROM hist h
+    ASOF LEFT JOIN events e ON h.adj_ticker = e.ticker AND h.adj_date < e.ex_date
+    """
+
+
+def create_b3_hist_adjusted_query():
+    return f"CREATE TABLE IF NOT EXISTS b3_hist_adjusted AS {b3_hist_adjusted_query()}"
+
+
+def insert_b3_hist_adjusted_query():
+    return f"INSERT INTO b3_hist_adjusted {b3_hist_adjusted_query(incremental=True)}"
+
+
+def latest_history_rows_query(rows):
+    """
+    The most recent `rows` rows of every ticker in b3_hist_adjusted, enough history to compute the latest features.
+    """
+    return f"""
+    SELECT * EXCLUDE (rn) FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY TRIM(ticker) ORDER BY date DESC) AS rn
+        FROM b3_hist_adjusted
+    ) t
+    WHERE rn <= {rows}
+    ORDER BY ticker, date
+    """
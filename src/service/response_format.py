@@ -0,0 +1,100 @@
+import io
+import json
+import math
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+
+FORMAT_MIMETYPES = {
+    'json': JSON_MIMETYPE,
+    'ndjson': NDJSON_MIMETYPE,
+    'arrow': ARROW_STREAM_MIMETYPE,
+    'parquet': PARQUET_MIMETYPE,
+}
+
+
+def resolve_format(format_param: str, accept_mimetypes, supported: list, default: str):
+    """
+    Pick the response format from an explicit ?format= value, falling back to the Accept header.
+
+    Args:
+        format_param: Value of the format query parameter, or None
+        accept_mimetypes: werkzeug MIMEAccept from the request
+        supported: Format names accepted by the endpoint, in order of preference
+        default: Format used when nothing matches
+
+    Returns:
+        Format name, or None if format_param names an unsupported format
+    """
+    if format_param:
+        format_param = format_param.strip().lower()
+        return format_param if format_param in supported else None
+    best = accept_mimetypes.best_match([FORMAT_MIMETYPES[fmt] for fmt in supported])
+    for fmt in supported:
+        if FORMAT_MIMETYPES[fmt] == best:
+            return fmt
+    return default
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _json_safe(row: dict) -> dict:
+    # NaN/Infinity are not valid JSON (e.g. close_to_best_buy when best_buy is 0), emit null instead
+    return {key: None if isinstance(value, float) and not math.isfinite(value) else value
+            for key, value in row.items()}
+
+
+def ndjson_stream(reader: pa.RecordBatchReader):
+    """
+    Yield one JSON document per row, one record batch at a time. Non-finite floats are written as null.
+    """
+    for batch in reader:
+        yield ''.join(json.dumps(_json_safe(row), default=str, allow_nan=False) + '\n'
+                      for row in batch.to_pylist())
+
+
+def arrow_ipc_stream(reader: pa.RecordBatchReader):
+    """
+    Yield the Arrow IPC stream encoding of the reader, flushing after every record batch.
+    """
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    # End-of-stream marker written on close
+    yield _drain(sink)
+
+
+def parquet_stream(reader: pa.RecordBatchReader):
+    """
+    Yield a Parquet file written one row group per record batch, flushing after every row group.
+    """
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    # Footer written on close
+    yield _drain(sink)
+
+
+def binary_stream(reader: pa.RecordBatchReader, response_format: str):
+    """
+    Encode a record batch reader in one of the binary/streaming formats ('ndjson', 'arrow' or 'parquet').
+    """
+    if response_format == 'arrow':
+        return arrow_ipc_stream(reader)
+    if response_format == 'parquet':
+        return parquet_stream(reader)
+    return ndjson_stream(reader)
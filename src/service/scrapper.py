@@ -17,9 +17,16 @@ class B3ScrapperService:
     _URL = 'https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_D{0}.ZIP'
 
     def __init__(self, business_day: BusinessDayService):
-        self._data_storage_handler = DataStorageService().get_storage_handler()
+        self._storage_handler = None
         self._business_day = business_day
 
+    @property
+    def _data_storage_handler(self):
+        # Built on first use: resolving the storage backend may reach out to remote storage
+        if self._storage_handler is None:
+            self._storage_handler = DataStorageService().get_storage_handler()
+        return self._storage_handler
+
     def fetch_data(self):
         file_name = self._business_day.get_last_business_day().strftime("%d%m%Y")
         file_path = f'b3/assets/{file_name}.zip'
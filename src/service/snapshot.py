@@ -0,0 +1,121 @@
+import logging
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+MARKET_DATA = 'market_data'
+LATEST_FEATURES = 'latest_features'
+
+
+class MarketSnapshotService(object):
+    """
+    Shares the current day's parsed market data and the latest features between API worker processes.
+
+    The publisher writes each dataset as an Arrow IPC file and atomically swaps it in with os.replace.
+    Readers memory-map the file, so every process reads the same pages from the OS page cache instead of
+    holding its own copy, and remap when the file on disk changes. The directory comes from
+    MARKET_SNAPSHOT_DIR (default: asset-data-lake-snapshot in the system temp dir).
+    """
+
+    def __init__(self, snapshot_dir: str = None):
+        self._dir = snapshot_dir or os.getenv('MARKET_SNAPSHOT_DIR') or \
+            os.path.join(tempfile.gettempdir(), 'asset-data-lake-snapshot')
+        self._lock = threading.Lock()
+        # name -> (file identity, memory-mapped table, ticker -> row indices)
+        self._loaded = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, f'{name}.arrow')
+
+    def publish(self, market_data: pd.DataFrame = None, latest_features: pd.DataFrame = None):
+        """
+        Write a new version of the given datasets. Readers in other processes pick it up on their next lookup.
+        """
+        os.makedirs(self._dir, exist_ok=True)
+        for name, df in ((MARKET_DATA, market_data), (LATEST_FEATURES, latest_features)):
+            if df is None:
+                continue
+            if df.empty:
+                logging.warning(f"Skipping empty {name} snapshot")
+                continue
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir, prefix=f'.{name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    with pa.ipc.new_file(f, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(tmp_path, self._path(name))
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            logging.info(f"Published {name} snapshot with {table.num_rows} rows")
+
+    def _table(self, name: str):
+        """
+        Memory-mapped table and ticker index for a dataset, remapped when a new version was swapped in.
+        Returns (None, None) if no snapshot has been published.
+        """
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None, None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        loaded = self._loaded.get(name)
+        if loaded is None or loaded[0] != identity:
+            with self._lock:
+                loaded = self._loaded.get(name)
+                if loaded is None or loaded[0] != identity:
+                    # Mapping the replaced file keeps the old inode alive until it is unmapped
+                    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+                    index = {}
+                    for i, ticker in enumerate(table.column('ticker').to_pylist()):
+                        index.setdefault(str(ticker).strip().upper(), []).append(i)
+                    loaded = (identity, table, index)
+                    self._loaded[name] = loaded
+                    logging.info(f"Loaded {name} snapshot with {table.num_rows} rows")
+        return loaded[1], loaded[2]
+
+    def _rows(self, name: str, ticker: str):
+        table, index = self._table(name)
+        if table is None:
+            return None
+        return table.take(pa.array(index.get(ticker.strip().upper(), []), type=pa.int64()))
+
+    def has_latest_features(self) -> bool:
+        """
+        Whether a latest features snapshot has been published (maps it on first call).
+        """
+        return self._table(LATEST_FEATURES)[0] is not None
+
+    def warm(self) -> bool:
+        """
+        Map and index every published dataset ahead of the first lookup.
+
+        Returns:
+            True if a latest features snapshot is available
+        """
+        self._table(MARKET_DATA)
+        return self.has_latest_features()
+
+    def get_market_rows(self, ticker: str):
+        """
+        Rows of the current day's market data for a ticker.
+
+        Returns:
+            DataFrame (possibly empty), or None if no market data snapshot exists
+        """
+        rows = self._rows(MARKET_DATA, ticker)
+        return rows.to_pandas() if rows is not None else None
+
+    def get_latest_features(self, ticker: str):
+        """
+        Latest featured row for a ticker as a dictionary, or None if not in the snapshot.
+        """
+        rows = self._rows(LATEST_FEATURES, ticker)
+        if rows is None or rows.num_rows == 0:
+            return None
+        return rows.slice(rows.num_rows - 1).to_pylist()[0]
@@ -1,4 +1,5 @@
 import os
+import threading
 
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
@@ -6,19 +7,75 @@ from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 from waitress import serve
 
-from service.asset_handler import AssetApiHandler
-from service.business_day import BusinessDayService
-from service.db.asset import AssetService
-from service.db.md_lake import MotherDuckLakeService
-from service.scrapper import B3ScrapperService
-
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
-md_lake = MotherDuckLakeService()
-b3_scrapper = B3ScrapperService(BusinessDayService(md_lake))
-asset_handler = AssetApiHandler(AssetService(md_lake, b3_scrapper))
+
+
+class LazyServices(object):
+    """
+    Builds the data lake, scrapper and asset handler on first use.
+    Services (and pandas/numpy/duckdb behind them) are imported here instead of at module level,
+    so the API can answer /health right after boot without waiting for MotherDuck.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._md_lake = None
+        self._b3_scrapper = None
+        self._snapshot = None
+        self._asset_handler = None
+
+    def _build(self):
+        with self._lock:
+            if self._asset_handler is not None:
+                return
+            from service.asset_handler import AssetApiHandler
+            from service.business_day import BusinessDayService
+            from service.db.asset import AssetService
+            from service.db.md_lake import MotherDuckLakeService
+            from service.scrapper import B3ScrapperService
+            from service.snapshot import MarketSnapshotService
+
+            snapshot = MarketSnapshotService()
+            md_lake = MotherDuckLakeService(snapshot)
+            b3_scrapper = B3ScrapperService(BusinessDayService(md_lake))
+            self._md_lake = md_lake
+            self._b3_scrapper = b3_scrapper
+            self._snapshot = snapshot
+            self._asset_handler = AssetApiHandler(AssetService(md_lake, b3_scrapper, snapshot))
+
+    @property
+    def loaded(self) -> bool:
+        return self._asset_handler is not None
+
+    @property
+    def md_lake(self):
+        if not self.loaded:
+            self._build()
+        return self._md_lake
+
+    @property
+    def b3_scrapper(self):
+        if not self.loaded:
+            self._build()
+        return self._b3_scrapper
+
+    @property
+    def snapshot(self):
+        if not self.loaded:
+            self._build()
+        return self._snapshot
+
+    @property
+    def asset_handler(self):
+        if not self.loaded:
+            self._build()
+        return self._asset_handler
+
+
+services = LazyServices()
 
 SWAGGER_URL = '/swagger'
 API_URL = '/swagger.yaml'
@@ -56,12 +113,65 @@ def get_asset(ticker):
     
     Args:
         ticker (str): The ticker symbol to search for
+
+    Query Parameters:
+        format (str): 'json', 'arrow' or 'parquet'; defaults to the Accept header, then json
         
     Returns:
-        JSON response with asset data or error message
+        JSON response with asset data or error message, or a single-row Arrow IPC / Parquet body
+    """
+    from service.response_format import FORMAT_MIMETYPES, binary_stream, resolve_format
+
+    response_format = resolve_format(request.args.get('format'), request.accept_mimetypes,
+                                     supported=['json', 'arrow', 'parquet'], default='json')
+    if response_format is None:
+        return jsonify({
+            'error': 'Invalid format',
+            'message': 'Format must be one of: json, arrow, parquet'
+        }), 400
+
+    as_arrow = response_format != 'json'
+    response, status = services.asset_handler.get_asset(ticker, as_arrow=as_arrow)
+    if not as_arrow or status != 200:
+        return jsonify(response), status
+    return app.response_class(binary_stream(response.to_reader(), response_format),
+                              mimetype=FORMAT_MIMETYPES[response_format])
+
+
+@app.route('/asset/<ticker>/history', methods=['GET'])
+def get_asset_history(ticker):
+    """
+    Stream precomputed features for a ticker over a date range from b3_featured.
+
+    Query Parameters:
+        start (str): Inclusive start date (YYYY-MM-DD, optional)
+        end (str): Inclusive end date (YYYY-MM-DD, optional)
+        columns (str): Comma-separated feature columns to return (optional, default: all)
+        format (str): 'ndjson', 'arrow' or 'parquet'; defaults to the Accept header, then ndjson
+
+    Returns:
+        NDJSON, Arrow IPC or Parquet stream with one row per trading day
     """
-    response, status = asset_handler.get_asset(ticker)
-    return jsonify(response), status
+    from service.response_format import FORMAT_MIMETYPES, binary_stream, resolve_format
+
+    response_format = resolve_format(request.args.get('format'), request.accept_mimetypes,
+                                     supported=['ndjson', 'arrow', 'parquet'], default='ndjson')
+    if response_format is None:
+        return jsonify({
+            'error': 'Invalid format',
+            'message': 'Format must be one of: ndjson, arrow, parquet'
+        }), 400
+
+    columns_param = request.args.get('columns', '').strip()
+    columns = [col.strip() for col in columns_param.split(',') if col.strip()] if columns_param else None
+
+    response, status = services.asset_handler.get_asset_range(
+        ticker, request.args.get('start'), request.args.get('end'), columns
+    )
+    if status != 200:
+        return jsonify(response), status
+
+    return app.response_class(binary_stream(response, response_format), mimetype=FORMAT_MIMETYPES[response_format])
 
 
 @app.route('/assets', methods=['GET'])
@@ -73,19 +183,43 @@ def list_assets():
         search (str): Search term to filter assets (minimum 3 characters)
         page (int): Page number (default: 1)
         page_size (int): Number of items per page (default: 20, max: 100)
+        format (str): 'json', 'arrow' or 'parquet'; defaults to the Accept header, then json
         
     Returns:
-        JSON response with paginated asset list and metadata
+        JSON response with paginated asset list and metadata. For Arrow IPC / Parquet the body holds
+        the asset page and the pagination metadata is sent in X-* response headers.
     """
+    from service.response_format import FORMAT_MIMETYPES, binary_stream, resolve_format
+
     try:
         # Get query parameters
         search_term = request.args.get('search', '').strip()
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
 
-        response, status = asset_handler.list_assets(search_term, page, page_size)
+        response_format = resolve_format(request.args.get('format'), request.accept_mimetypes,
+                                         supported=['json', 'arrow', 'parquet'], default='json')
+        if response_format is None:
+            return jsonify({
+                'error': 'Invalid format',
+                'message': 'Format must be one of: json, arrow, parquet'
+            }), 400
 
-        return jsonify(response), status
+        as_arrow = response_format != 'json'
+        response, status = services.asset_handler.list_assets(search_term, page, page_size, as_arrow=as_arrow)
+
+        if not as_arrow or status != 200:
+            return jsonify(response), status
+
+        pagination = response['pagination']
+        headers = {
+            'X-Page': str(pagination['page']),
+            'X-Page-Size': str(pagination['page_size']),
+            'X-Total-Count': str(pagination['total_count']),
+            'X-Total-Pages': str(pagination['total_pages']),
+        }
+        return app.response_class(binary_stream(response['assets'].to_reader(), response_format),
+                                  mimetype=FORMAT_MIMETYPES[response_format], headers=headers)
 
     except ValueError as e:
         return jsonify({
@@ -107,7 +241,10 @@ def update_b3_data():
     This endpoint:
     1. Fetches the latest B3 historical data using B3ScrapperService
     2. Updates the b3_hist table in the data lake with the new data
-    3. Returns status information about the operation
+    3. Refreshes the adjusted prices and the b3_latest_features table / in-memory lookup,
+       publishing the latest features to the shared market snapshot
+    4. Publishes the parsed day to the shared market snapshot
+    5. Returns status information about the operation
     
     Returns:
         JSON response with operation status and statistics
@@ -115,7 +252,7 @@ def update_b3_data():
     try:
         # Fetch data from B3 source
         app.logger.info("Starting B3 data fetch...")
-        b3_data = b3_scrapper.fetch_data()
+        b3_data = services.b3_scrapper.fetch_data()
 
         if b3_data is None or b3_data.empty:
             return jsonify({
@@ -125,8 +262,10 @@ def update_b3_data():
 
         app.logger.info(f"Fetched {len(b3_data)} records from B3 source")
 
-        md_lake.update_b3_hist_table(b3_data)
-        stats = md_lake.get_b3_hist_stats()
+        services.md_lake.update_b3_hist_table(b3_data)
+        stats = services.md_lake.get_b3_hist_stats()
+        # Share the parsed day with every worker process (latest features are published by the refresh)
+        services.snapshot.publish(market_data=b3_data)
 
         app.logger.info(f"Successfully updated b3_hist table. Total records: {stats['total_records']}")
 
@@ -146,10 +285,32 @@ def update_b3_data():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness check endpoint. Does not touch the data lake."""
     return jsonify({'status': 'healthy'}), 200
 
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness check endpoint.
+
+    Verifies the MotherDuck connection answers, which history, listing and recompute lookups need,
+    so traffic is only routed once the data lake is reachable. The latest features come from the shared
+    market snapshot when one has been published (mapped here ahead of the first lookup), otherwise the
+    per-worker lookup is loaded.
+    """
+    try:
+        if services.md_lake.ping():
+            if services.snapshot.warm():
+                return jsonify({'status': 'ready', 'source': 'snapshot'}), 200
+            services.md_lake.load_latest_features()
+            return jsonify({'status': 'ready'}), 200
+        return jsonify({'status': 'not ready', 'message': 'MotherDuck connection unavailable'}), 503
+    except Exception as e:
+        app.logger.error(f"Readiness check failed: {str(e)}")
+        return jsonify({'status': 'not ready', 'message': str(e)}), 503
+
+
 if __name__ == '__main__':
     # Use waitress for production serving
     serve(app, host='0.0.0.0', port=5002)
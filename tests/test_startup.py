@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# Importing web_api must stay cheap so /health answers right after boot
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ['pandas', 'duckdb', 'numpy']
+
+STARTUP_PROBE = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import web_api
+elapsed = time.perf_counter() - start
+
+response = web_api.app.test_client().get('/health')
+print(json.dumps({
+    'elapsed': elapsed,
+    'loaded': [name for name in %r if name in sys.modules],
+    'health_status': response.status_code,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_startup_probe():
+    # Fresh interpreter so nothing is already imported by the test runner
+    result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=SRC_DIR, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_web_api_startup_budget():
+    probe = run_startup_probe()
+
+    assert probe['elapsed'] < IMPORT_BUDGET_SECONDS, \
+        f"importing web_api took {probe['elapsed']:.3f}s (budget {IMPORT_BUDGET_SECONDS}s)"
+    assert probe['loaded'] == [], f"heavy modules imported at startup: {probe['loaded']}"
+    assert probe['health_status'] == 200